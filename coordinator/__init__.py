@@ -0,0 +1 @@
+from coordinator.coordinator import *
\ No newline at end of file
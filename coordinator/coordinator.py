@@ -0,0 +1,241 @@
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+
+from colorama import Fore, Style
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+TMP = "tmp"
+
+
+class Lease:
+    """A claimed job, kept alive by touching its leased file from a background thread."""
+
+    def __init__(self, queue, job, path):
+        self.queue = queue
+        self.job = job
+        self.path = path
+        self.lost = threading.Event()
+        self.follow_ups = []  # (kind, payload) jobs to submit once this one completes
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._beat, daemon=True)
+        self._heartbeat.start()
+
+    @property
+    def kind(self):
+        return self.job["kind"]
+
+    @property
+    def payload(self):
+        return self.job["payload"]
+
+    def _beat(self):
+        interval = self.queue.lease_timeout / 3
+        while not self._stop.wait(interval):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                # Our lease expired and another node reclaimed the job
+                self.lost.set()
+                return
+
+    def _finish(self, destination):
+        self._stop.set()
+        self._heartbeat.join()
+        # Move the leased file out of reach first: the rename is atomic and raises if the job was
+        # reclaimed, and nothing else touches our tmp/ name, so the rewrite can't resurrect a lease
+        # or clobber a copy another node has since claimed from pending/.
+        staged = os.path.join(self.queue.root, TMP, os.path.basename(self.path))
+        try:
+            os.rename(self.path, staged)
+        except FileNotFoundError:
+            self.lost.set()
+            print(f"{Fore.RED}Lease on job {self.job['id']} was lost before it finished.{Style.RESET_ALL}")
+            return False
+        self.queue._write_atomic(staged, self.job)
+        os.rename(staged, destination)
+        return True
+
+    def follow_up(self, kind, payload):
+        """Queue a job to submit only if this one completes, so a retried job never submits it twice."""
+        self.follow_ups.append((kind, payload))
+
+    def complete(self, result=None):
+        """Move the job to the done directory, recording the handler's result, then submit follow-ups."""
+        self.job["result"] = result
+        self.job["history"].append({"node": self.queue.node_id, "time": time.time(), "status": "done"})
+        if not self._finish(self.queue._job_path(DONE, self.job["id"])):
+            return False
+        for kind, payload in self.follow_ups:
+            self.queue.submit(kind, payload)
+        return True
+
+    def release(self, error):
+        """Return the job to pending, or to failed once it has used up its attempts."""
+        self.job["history"].append({"node": self.queue.node_id, "time": time.time(), "error": error})
+        state = FAILED if self.job["attempts"] >= self.queue.max_attempts else PENDING
+        return self._finish(self.queue._job_path(state, self.job["id"]))
+
+
+class WorkQueue:
+    """
+    Job queue shared by several nodes through a common directory.
+
+    Each job is a JSON file that moves between the pending/, leased/, done/ and failed/
+    subdirectories with os.rename, which is atomic on a single filesystem, so exactly
+    one node wins every claim. The mtime of a leased file is its heartbeat: a lease
+    that has not been touched for lease_timeout seconds is returned to pending by
+    whichever node notices first.
+    """
+
+    def __init__(self, root, node_id=None, lease_timeout=60.0, max_attempts=3):
+        self.root = root
+        self.node_id = re.sub(r"[^\w.]", "_", node_id or f"{socket.gethostname()}.{os.getpid()}")
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        for state in (PENDING, LEASED, DONE, FAILED, TMP):
+            os.makedirs(os.path.join(root, state), exist_ok=True)
+
+    def _job_path(self, state, job_id):
+        return os.path.join(self.root, state, f"{job_id}.json")
+
+    def _lease_path(self, job_id):
+        return os.path.join(self.root, LEASED, f"{job_id}@{self.node_id}.json")
+
+    def _write_atomic(self, path, job):
+        tmp_path = os.path.join(self.root, TMP, f"{os.path.basename(path)}.{self.node_id}.{uuid.uuid4().hex}")
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def submit(self, kind, payload):
+        """
+        Publish a new job to the pending directory.
+
+        Args:
+            kind (str): Job type, matched against the handlers of each worker (e.g. "download").
+            payload (dict): JSON-serializable arguments for the handler.
+
+        Returns:
+            str: The job id.
+        """
+        if not kind.isalnum():
+            raise ValueError(f"Job kind must be alphanumeric: {kind!r}")
+        # Zero-padded timestamp prefix keeps directory listings in submission order
+        job_id = f"{time.time_ns():020d}-{kind}-{uuid.uuid4().hex[:8]}"
+        job = {"id": job_id, "kind": kind, "payload": payload, "attempts": 0, "history": []}
+        self._write_atomic(self._job_path(PENDING, job_id), job)
+        return job_id
+
+    def claim(self, kinds):
+        """
+        Lease the oldest pending job, trying each kind in order of preference.
+
+        Args:
+            kinds (list): Job kinds this node accepts, most preferred first.
+
+        Returns:
+            Lease or None: The claimed job, or None if nothing matching is pending.
+        """
+        names = sorted(os.listdir(os.path.join(self.root, PENDING)))
+        for kind in kinds:
+            for name in names:
+                job_id = name[:-len(".json")]
+                parts = job_id.split("-")
+                # Skip anything that isn't a job file, e.g. a stray file dropped in the shared directory
+                if not name.endswith(".json") or len(parts) < 3 or parts[1] != kind:
+                    continue
+                src = self._job_path(PENDING, job_id)
+                dst = self._lease_path(job_id)
+                try:
+                    # Refresh the mtime first so the lease doesn't look expired once renamed
+                    os.utime(src)
+                    os.rename(src, dst)
+                except FileNotFoundError:
+                    continue  # Another node got there first
+
+                try:
+                    with open(dst) as f:
+                        job = json.load(f)
+                except ValueError:
+                    os.rename(dst, self._job_path(FAILED, job_id))  # Unreadable, don't let it crash workers
+                    continue
+                job["attempts"] += 1
+                lease = Lease(self, job, dst)
+                if job["attempts"] > self.max_attempts:
+                    lease.release("exceeded max attempts")
+                    continue
+                self._write_atomic(dst, job)
+                return lease
+        return None
+
+    def reclaim_expired(self):
+        """Return leases whose heartbeat is older than lease_timeout to pending."""
+        reclaimed = 0
+        # Also sweep tmp/, where a node that died mid-_finish leaves its staged lease file
+        for state in (LEASED, TMP):
+            reclaimed += self._reclaim_expired_in(os.path.join(self.root, state))
+        return reclaimed
+
+    def _reclaim_expired_in(self, leased_dir):
+        reclaimed = 0
+        for name in os.listdir(leased_dir):
+            if not name.endswith(".json") or "@" not in name:
+                continue
+            path = os.path.join(leased_dir, name)
+            job_id, owner = name[:-len(".json")].split("@", 1)
+            try:
+                if time.time() - os.stat(path).st_mtime < self.lease_timeout:
+                    continue
+                os.rename(path, self._job_path(PENDING, job_id))
+            except FileNotFoundError:
+                continue  # Completed or reclaimed in the meantime
+            print(f"{Fore.YELLOW}Reclaimed expired lease on job {job_id} from {owner}.{Style.RESET_ALL}")
+            reclaimed += 1
+        return reclaimed
+
+    def work(self, handlers, poll_interval=5.0, max_idle=None):
+        """
+        Process jobs until interrupted, or until the queue has been idle for max_idle seconds.
+
+        Args:
+            handlers (dict): Maps job kind to a callable(payload, lease) returning a JSON-serializable
+                result. Jobs it passes to lease.follow_up() are submitted once it completes. Dict order
+                is the claim preference.
+            poll_interval (float, optional): Seconds to wait between polls when no job is available.
+            max_idle (float, optional): Exit after this many seconds without work. None runs forever.
+
+        Returns:
+            int: Number of jobs completed by this node.
+        """
+        completed = 0
+        idle_since = time.monotonic()
+        print(f"{Fore.CYAN}Worker {self.node_id} accepting: {', '.join(handlers)}{Style.RESET_ALL}")
+
+        while True:
+            self.reclaim_expired()
+            lease = self.claim(list(handlers))
+            if lease is None:
+                if max_idle is not None and time.monotonic() - idle_since >= max_idle:
+                    return completed
+                time.sleep(poll_interval)
+                continue
+
+            print(f"{Fore.CYAN}Claimed {lease.kind} job {lease.job['id']} "
+                  f"(attempt {lease.job['attempts']}/{self.max_attempts}){Style.RESET_ALL}")
+            try:
+                result = handlers[lease.kind](lease.payload, lease)
+            except Exception as e:
+                print(f"{Fore.RED}Job {lease.job['id']} failed: {str(e)}{Style.RESET_ALL}")
+                lease.release(str(e))
+            else:
+                if lease.complete(result):
+                    completed += 1
+            idle_since = time.monotonic()
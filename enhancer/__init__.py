@@ -1,2 +1,3 @@
 from enhancer.apollo import *
-from enhancer.enhancer import *
+from enhancer.cache import *
+from enhancer.enhancer import *
\ No newline at end of file
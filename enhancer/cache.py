@@ -0,0 +1,156 @@
+import hashlib
+import os
+import uuid
+
+import numpy as np
+from colorama import Fore, Style
+
+HASH_BLOCK_FRAMES = 1 << 16
+
+_checkpoint_hashes = {}  # (path, size, mtime) -> sha256, so weights are hashed once per process
+
+
+def checkpoint_hash(checkpoint_file):
+    """SHA-256 of a checkpoint file's contents."""
+    stat = os.stat(checkpoint_file)
+    memo_key = (os.path.realpath(checkpoint_file), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _checkpoint_hashes:
+        h = hashlib.sha256()
+        with open(checkpoint_file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _checkpoint_hashes[memo_key] = h.hexdigest()
+    return _checkpoint_hashes[memo_key]
+
+
+class EnhancementCache:
+    """
+    On-disk cache of enhanced audio, keyed by input PCM and model parameters.
+
+    Entries are .npy files named "<kind>-<sha256>.npy", where kind is "track" for whole
+    outputs and "window" for single chunk outputs. Reads refresh an entry's mtime, and
+    the least recently used entries are evicted once the directory exceeds max_bytes.
+    Window entries hold the full 10-second model output for every 5-second step, about
+    twice the float32 size of the input (~2.5 GB per hour of stereo audio).
+    """
+
+    def __init__(self, cache_dir, max_bytes=10 * 2 ** 30, per_window=False):
+        """
+        Args:
+            cache_dir (str): Directory to store entries in.
+            max_bytes (int, optional): Size bound for all entries. Defaults to 10 GiB.
+            per_window (bool, optional): Also cache each chunk window, so an interrupted long
+                track resumes without recomputing finished windows.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.per_window = per_window
+        self.counters = {kind: {"hits": 0, "misses": 0, "puts": 0} for kind in ("track", "window")}
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        # Running size of the directory, so puts don't have to scan it; resynced on eviction
+        self._bytes = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def model_key(checkpoint_file, chunk_seconds, precision, samplerate):
+        """Identify everything besides the input that changes the model's output."""
+        return f"{checkpoint_hash(checkpoint_file)}:{chunk_seconds}:{precision}:{samplerate}"
+
+    @staticmethod
+    def key(kind, model_key, audio):
+        """
+        Build a cache key.
+
+        Args:
+            kind (str): "track" or "window".
+            model_key (str): Result of model_key().
+            audio (np.ndarray or torch.Tensor): The input PCM the output was computed from.
+
+        Returns:
+            str: The key.
+        """
+        if hasattr(audio, "cpu"):
+            audio = audio.detach().cpu().numpy()
+        h = hashlib.sha256(model_key.encode())
+        h.update(f"{audio.dtype}{audio.shape}".encode())
+        # Hash fixed-size frame slices so a strided view (e.g. a transposed memmap) is never copied whole
+        for start in range(0, audio.shape[-1], HASH_BLOCK_FRAMES):
+            h.update(np.ascontiguousarray(audio[..., start:start + HASH_BLOCK_FRAMES]))
+        return f"{kind}-{h.hexdigest()}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        """Return the cached array for key, or None."""
+        counters = self.counters[key.split("-", 1)[0]]
+        path = self._path(key)
+        try:
+            output = np.load(path)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError, EOFError):  # Missing, or a partial write from a crashed process
+            counters["misses"] += 1
+            return None
+        counters["hits"] += 1
+        return output
+
+    def put(self, key, output):
+        """Store output under key, then evict least recently used entries if over max_bytes."""
+        path = self._path(key)
+        tmp_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, output)
+        try:
+            self._bytes -= os.path.getsize(path)  # Replacing an existing entry
+        except FileNotFoundError:
+            pass  # New entry, or another process evicted it in the meantime
+        self._bytes += os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        self.counters[key.split("-", 1)[0]]["puts"] += 1
+        if self._bytes > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._bytes = total
+
+    def stats(self):
+        """Hit/miss/put counters per kind, evictions, and current size on disk."""
+        entries = self._entries()
+        return {
+            **{kind: dict(counters) for kind, counters in self.counters.items()},
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        track, window = stats["track"], stats["window"]
+        print(f"{Fore.CYAN}Enhancement cache: track {track['hits']} hits/{track['misses']} misses, "
+              f"window {window['hits']} hits/{window['misses']} misses, {stats['evictions']} evictions, "
+              f"{stats['entries']} entries ({stats['bytes'] / 2 ** 20:.1f}/{stats['max_bytes'] / 2 ** 20:.0f} MiB)"
+              f"{Style.RESET_ALL}")
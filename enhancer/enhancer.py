@@ -1,4 +1,6 @@
 import argparse
+import queue
+import threading
 import warnings
 import librosa
 import numpy as np
@@ -8,6 +10,7 @@ from tqdm import tqdm
 from colorama import Fore, Style
 
 from .apollo import Apollo
+from .cache import EnhancementCache
 
 warnings.filterwarnings(
     "ignore",
@@ -15,12 +18,28 @@ warnings.filterwarnings(
     category=FutureWarning
 )
 
+CHUNK_SECONDS = 10
+PRECISION = torch.float32
+
 
 def load_audio(file_path):
     audio, samplerate = librosa.load(file_path, mono=False, sr=44100)
     return torch.from_numpy(audio), samplerate
 
 
+def array_to_tensor(audio, samplerate):
+    """Wrap a scraper (frames, channels) array as a (channels, frames) float32 tensor, sharing memory when possible."""
+    if audio.dtype == np.int16:
+        audio = audio.astype(np.float32)
+        audio /= 32768.0
+    elif audio.dtype != np.float32:
+        audio = audio.astype(np.float32)
+    if samplerate != 44100:
+        audio = librosa.resample(audio, orig_sr=samplerate, target_sr=44100, axis=0)
+    # torch.from_numpy shares the buffer (including np.memmap pages), the transpose is a strided view
+    return torch.from_numpy(audio.T), 44100
+
+
 def save_audio(file_path, audio, fs=44100):
     sf.write(file_path, audio, fs)
 
@@ -36,11 +55,27 @@ def _getWindowingArray(window_size, fade_size):
     return window
 
 
-def enchance(model, audio_path, device):
-    test_data, samplerate = load_audio(audio_path)
-    test_data = test_data.to(device)  # Move audio data to the device
+def enhance_stream(model, blocks, device, samplerate=44100, total=None, cache=None, model_key=None, stop=None):
+    """
+    Run the overlapping chunk loop over audio that arrives in blocks.
+
+    Each enhanced span is yielded as soon as no later window can contribute to it, so
+    output starts after the first window instead of after the whole track is loaded.
 
-    C = 10 * samplerate  # chunk_size seconds to samples
+    Args:
+        model (Apollo): The loaded model.
+        blocks (iterable): Consecutive (channels, frames) or mono (frames,) tensors.
+        device (str): Device to run inference on.
+        samplerate (int, optional): Sample rate of the blocks.
+        total (int, optional): Expected number of frames, for the progress bar.
+        cache (EnhancementCache, optional): If given, each window's output is looked up and stored here.
+        model_key (str, optional): EnhancementCache.model_key() for the model, required with cache.
+        stop (threading.Event, optional): Checked between windows; once set, no further windows are run.
+
+    Yields:
+        np.ndarray: Enhanced (frames, channels) blocks.
+    """
+    C = CHUNK_SECONDS * samplerate  # chunk_size seconds to samples
     N = 2
     step = C // N
     fade_size = 3 * 44100  # 3 seconds
@@ -48,63 +83,165 @@ def enchance(model, audio_path, device):
 
     border = C - step
 
-    # Handle mono inputs correctly
-    if len(test_data.shape) == 1:
-        test_data = test_data.unsqueeze(0)
-
-    # Pad the input if necessary
-    if test_data.shape[1] > 2 * border and (border > 0):
-        test_data = torch.nn.functional.pad(test_data, (border, border), mode='reflect')
-
     windowingArray = _getWindowingArray(C, fade_size).to(device)  # Move to device
 
-    result = torch.zeros((1,) + tuple(test_data.shape), dtype=torch.float32, device=device)
-    counter = torch.zeros((1,) + tuple(test_data.shape), dtype=torch.float32, device=device)
+    blocks = iter(blocks)
+    buffer = None  # Input samples from (padded) position i onwards
+    padded = None  # Whether the input gets reflect-padded, decided once it's known to be long enough
+    length = None  # Total (padded) length, known once the input is exhausted
+    result = counter = None  # Accumulators for positions i to i + C
 
     i = 0
-    progress_bar = tqdm(total=test_data.shape[1], desc="Processing audio_path chunks", leave=True)
-
-    while i < test_data.shape[1]:
-        part = test_data[:, i:i + C]
-        length = part.shape[-1]
-        if length < C:
-            if length > C // 2 + 1:
-                part = torch.nn.functional.pad(input=part, pad=(0, C - length), mode='reflect')
+    progress_bar = tqdm(total=total, desc="Processing audio_path chunks", leave=True)
+
+    while True:
+        if stop is not None and stop.is_set():
+            break
+
+        # Read until the padding decision can be made and the next chunk is known not to be the last
+        needed = 2 * border if padded is None else C
+        while length is None and (buffer is None or buffer.shape[1] <= needed):
+            block = next(blocks, None)
+            if block is None:
+                if buffer is None:  # Empty input
+                    progress_bar.close()
+                    return
+                if padded is None:
+                    padded = False
+                if padded:
+                    buffer = torch.nn.functional.pad(buffer, (0, border), mode='reflect')
+                length = i + buffer.shape[1]
+                break
+            block = block.to(device)  # Move audio data to the device
+            if len(block.shape) == 1:  # Handle mono inputs correctly
+                block = block.unsqueeze(0)
+            buffer = block if buffer is None else torch.cat((buffer, block), dim=1)
+
+        # Pad the start of the input if necessary
+        if padded is None:
+            padded = border > 0 and buffer.shape[1] > 2 * border
+            if padded:
+                buffer = torch.nn.functional.pad(buffer, (border, 0), mode='reflect')
+            continue  # Re-check whether the first chunk is the last one
+
+        if length is not None and i >= length:
+            break
+
+        part = buffer[:, :C]
+        part_length = part.shape[-1]
+        if part_length < C:
+            if part_length > C // 2 + 1:
+                part = torch.nn.functional.pad(input=part, pad=(0, C - part_length), mode='reflect')
             else:
-                part = torch.nn.functional.pad(input=part, pad=(0, C - length, 0, 0), mode='constant', value=0)
-
-        chunk = part.unsqueeze(0)  # Prepare for model input
-        with torch.no_grad():
-            out = model(chunk).squeeze(0).squeeze(0)
+                part = torch.nn.functional.pad(input=part, pad=(0, C - part_length, 0, 0), mode='constant', value=0)
+
+        out = None
+        if cache is not None:
+            window_key = EnhancementCache.key("window", model_key, part)
+            out = cache.get(window_key)
+            if out is not None:
+                out = torch.from_numpy(out).to(device)
+        if out is None:
+            chunk = part.unsqueeze(0)  # Prepare for model input
+            with torch.no_grad():
+                out = model(chunk).squeeze(0).squeeze(0)
+            if cache is not None:
+                cache.put(window_key, out.cpu().numpy())
 
         window = windowingArray.clone()  # Use clone to avoid modifying the original tensor
         if i == 0:  # First audio_path chunk, no fadein
             window[:fade_size] = 1
-        elif i + C >= test_data.shape[1]:  # Last audio_path chunk, no fadeout
+        elif length is not None and i + C >= length:  # Last audio_path chunk, no fadeout
             window[-fade_size:] = 1
 
-        result[..., i:i + length] += out[..., :length] * window[..., :length]
-        counter[..., i:i + length] += window[..., :length]
-
+        if result is None:
+            result = torch.zeros((buffer.shape[0], C), dtype=PRECISION, device=device)
+            counter = torch.zeros((buffer.shape[0], C), dtype=PRECISION, device=device)
+        result[..., :part_length] += out[..., :part_length] * window[..., :part_length]
+        counter[..., :part_length] += window[..., :part_length]
+
+        # Positions before the next chunk's start are final; emit them minus any padding
+        final = step if length is None or i + step < length else length - i
+        start = border - i if padded else 0
+        end = length - border - i if padded and length is not None else final
+        start, end = max(start, 0), min(end, final)
+        if end > start:
+            final_output = (result[..., start:end] / counter[..., start:end]).cpu().numpy()
+            np.nan_to_num(final_output, copy=False, nan=0.0)
+            yield final_output.T
+
+        result = torch.nn.functional.pad(result[..., step:], (0, step))
+        counter = torch.nn.functional.pad(counter[..., step:], (0, step))
+        buffer = buffer[:, step:]
         i += step
         progress_bar.update(step)
 
     progress_bar.close()
 
-    final_output = result / counter
-    final_output = final_output.squeeze(0).cpu().numpy()  # Move final output back to CPU for saving
-    np.nan_to_num(final_output, copy=False, nan=0.0)
 
-    # Remove padding if added earlier
-    if test_data.shape[1] > 2 * border and (border > 0):
-        final_output = final_output[..., border:-border]
+def _load_input(audio_path):
+    if isinstance(audio_path, tuple):
+        return array_to_tensor(*audio_path)
+    return load_audio(audio_path)
 
-    return samplerate, final_output.T
 
+def _enhance_tensor(model, test_data, samplerate, device, cache=None, model_key=None):
+    blocks = enhance_stream(model, [test_data], device, samplerate, total=test_data.shape[-1],
+                            cache=cache, model_key=model_key)
+    return samplerate, np.concatenate(list(blocks), axis=0)
 
-def process_audio(input_wav, output_wav, checkpoint_file):
-    device = "cuda" if torch.cuda.is_available() else "cpu"
 
+def enchance(model, audio_path, device):
+    test_data, samplerate = _load_input(audio_path)
+    return _enhance_tensor(model, test_data, samplerate, device)
+
+
+def _prefetch(iterable, max_pending, stop):
+    """
+    Pull items from iterable in a background thread, through a queue of at most max_pending items.
+
+    Once stop is set, or this generator is closed, the thread stops pulling and closes iterable,
+    so a source like YouTubeAudioScraper.stream_audio() shuts down its ffmpeg process and download.
+    """
+    items = queue.Queue(maxsize=max_pending)
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((None, None))
+        except Exception as e:
+            put((None, e))
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is None:
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def load_model(checkpoint_file, device):
     checkpoint = torch.load(checkpoint_file, map_location=device)
     if ".bin" in checkpoint_file:
         sr = checkpoint['model_args'].sr
@@ -125,12 +262,130 @@ def process_audio(input_wav, output_wav, checkpoint_file):
     ).to(device)
 
     model.load_state_dict(checkpoint['state_dict'])
+    return model
+
+
+def process_audio(input_wav, output_wav, checkpoint_file, cache=None):
+    """
+    Restore the high-frequency content of a track with Apollo.
+
+    Args:
+        input_wav (str or tuple): Path to a WAV file, or the (numpy_data, sample_rate) pair returned
+            by YouTubeAudioScraper.download_audio, which skips re-reading the audio from disk.
+        output_wav (str): Path to write the enhanced WAV file.
+        checkpoint_file (str): Path to the .bin or .ckpt model weights.
+        cache (EnhancementCache, optional): Reuse earlier outputs for the same input PCM and model
+            parameters, checked before the model is loaded.
+    """
+    test_data, samplerate = _load_input(input_wav)
+
+    model_key = window_cache = None
+    if cache is not None:
+        model_key = EnhancementCache.model_key(checkpoint_file, CHUNK_SECONDS, PRECISION, samplerate)
+        track_key = EnhancementCache.key("track", model_key, test_data)
+        output = cache.get(track_key)
+        if output is not None:
+            save_audio(output_wav, output, samplerate)
+            print(f"{Fore.GREEN}Reused cached enhancement.{Style.RESET_ALL}")
+            print(f"{Fore.GREEN}Enhanced file saved to: {output_wav}{Style.RESET_ALL}")
+            cache.print_stats()
+            return
+        if cache.per_window:
+            window_cache = cache
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = load_model(checkpoint_file, device)
 
     with torch.no_grad():
-        fs, output = enchance(model, input_wav, device)
+        fs, output = _enhance_tensor(model, test_data, samplerate, device, window_cache, model_key)
     save_audio(output_wav, output, fs)
     print(f"{Fore.GREEN}Enhanced file saved to: {output_wav}{Style.RESET_ALL}")
 
+    if cache is not None:
+        cache.put(track_key, output)
+        cache.print_stats()
+
+
+def process_stream(blocks, output_wav, checkpoint_file, max_pending=8, cache=None, input_wav=None):
+    """
+    Restore a track with Apollo while it is still being decoded.
+
+    Decoding, inference and writing run concurrently, connected by queues of at most
+    max_pending blocks, so wall time approaches that of the slowest stage.
+
+    Args:
+        blocks (iterable): float32 (frames, channels) blocks at 44.1kHz, e.g. from
+            YouTubeAudioScraper.stream_audio().
+        output_wav (str): Path to write the enhanced WAV file.
+        checkpoint_file (str): Path to the .bin or .ckpt model weights.
+        max_pending (int, optional): Maximum number of blocks buffered between stages.
+        cache (EnhancementCache, optional): Window outputs are reused and stored here if the
+            cache is per_window. Whole-track entries need the full input up front, so they don't apply.
+        input_wav (str, optional): Also write the unenhanced input blocks to this path from the
+            writer stage, so the plain audio doesn't need a separate decode.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = load_model(checkpoint_file, device)
+
+    model_key = None
+    if cache is not None and cache.per_window:
+        model_key = EnhancementCache.model_key(checkpoint_file, CHUNK_SECONDS, PRECISION, 44100)
+    else:
+        cache = None
+
+    outputs = queue.Queue(maxsize=max_pending)  # (path, block) pairs for the writer
+    stop = threading.Event()  # Set on a write error or on exit, stops decoding and inference
+    errors = []
+
+    def write():
+        files = {}
+        try:
+            while True:
+                entry = outputs.get()
+                if entry is None:
+                    break
+                if errors:
+                    continue  # Drain until inference notices stop, so it never blocks on a full queue
+                path, block = entry
+                try:
+                    if path not in files:
+                        files[path] = sf.SoundFile(path, "w", samplerate=44100, channels=block.shape[1])
+                    files[path].write(block)
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+        finally:
+            for output_file in files.values():
+                output_file.close()
+
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+
+    def tee(block):
+        if input_wav is not None:
+            outputs.put((input_wav, block))
+        return torch.from_numpy(block.T)  # Zero-copy view
+
+    prefetched = _prefetch(blocks, max_pending, stop)
+    try:
+        inputs = (tee(block) for block in prefetched)
+        with torch.no_grad():
+            for output in enhance_stream(model, inputs, device, cache=cache, model_key=model_key, stop=stop):
+                outputs.put((output_wav, output))
+    finally:
+        stop.set()
+        prefetched.close()  # Joins the decode thread, which closes the source
+        outputs.put(None)
+        writer.join()
+
+    if errors:
+        raise errors[0]
+    if input_wav is not None:
+        print(f"{Fore.GREEN}File saved to: {input_wav}{Style.RESET_ALL}")
+    print(f"{Fore.GREEN}Enhanced file saved to: {output_wav}{Style.RESET_ALL}")
+    if cache is not None:
+        cache.print_stats()
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Audio Inference Script")
@@ -1,7 +1,13 @@
+import json
 import os
 import re
+import struct
+import subprocess
+import threading
+from collections import deque
 from io import BytesIO
 
+import numpy as np
 import soundfile as sf
 from colorama import Fore, Style, init
 from pydub import AudioSegment
@@ -12,16 +18,42 @@ from tqdm import tqdm
 init(autoreset=True)
 
 
+SUPPORTED_DTYPES = ("int16", "float32", "float64")
+PCM_FORMATS = {"int16": "s16le", "float32": "f32le", "float64": "f64le"}  # ffmpeg raw output formats
+NPY_HEADER_BYTES = 128  # Fixed .npy header size, so the shape can be filled in after decoding
+
+
+def _npy_header(dtype, shape):
+    """Build a version 1.0 .npy header padded to NPY_HEADER_BYTES."""
+    header = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": shape})
+    header = header.ljust(NPY_HEADER_BYTES - 10 - 1) + "\n"  # 10 bytes of magic, version and length
+    return np.lib.format.magic(1, 0) + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
 class YouTubeAudioScraper:
-    def __init__(self, url):
+    def __init__(self, url, dtype="float64", mmap_dir=None, prefetch=True):
+        """
+        Args:
+            url (str): The YouTube video URL.
+            dtype (str, optional): Sample type of the NumPy data ("int16", "float32" or "float64").
+            mmap_dir (str, optional): If set, decode into a memory-mapped .npy file in this directory
+                instead of holding the samples in RAM.
+            prefetch (bool, optional): Download the audio_path during setup. Disable when using
+                stream_audio() so the download overlaps decoding.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype!r}, expected one of {SUPPORTED_DTYPES}")
         self.url = url
         self.yt = YouTube(url)
+        self.dtype = dtype
+        self.mmap_dir = mmap_dir
         self.audio_buffer = None  # Store the audio_path buffer to avoid re-downloading
         self.numpy_data = None  # Store NumPy array data for reuse
         self.sample_rate = None
         print(f"{Fore.CYAN}Initialized YouTube scraper for URL: {url}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}Video title: {self.yt.title}{Style.RESET_ALL}")
-        self._buffer_audio()  # Ensure the buffer is initialized during setup
+        if prefetch:
+            self._buffer_audio()  # Ensure the buffer is initialized during setup
 
     def _get_audio_stream(self):
         """Retrieve the audio_path stream from the YouTube video."""
@@ -34,8 +66,8 @@ class YouTubeAudioScraper:
             raise ValueError(f"{Fore.RED}Failed to retrieve audio_path stream.{Style.RESET_ALL}")
         return audio_stream
 
-    def _buffer_audio(self):
-        """Buffer the audio_path stream into a BytesIO object."""
+    def _buffer_audio(self, on_chunk=None):
+        """Buffer the audio_path stream into a BytesIO object, passing each chunk to on_chunk as it arrives."""
         if self.audio_buffer:
             print(f"{Fore.GREEN}Audio already downloaded. Using cached buffer.{Style.RESET_ALL}")
             return self.audio_buffer
@@ -57,6 +89,8 @@ class YouTubeAudioScraper:
         ) as pbar:
             def progress_hook(stream, chunk, bytes_remaining):
                 pbar.update(len(chunk))
+                if on_chunk:
+                    on_chunk(chunk)
 
             self.yt.register_on_progress_callback(progress_hook)
             audio_stream.stream_to_buffer(buffer)
@@ -71,22 +105,61 @@ class YouTubeAudioScraper:
             print(f"{Fore.GREEN}NumPy data already converted. Reusing cached data.{Style.RESET_ALL}")
             return self.numpy_data, self.sample_rate
 
-        buffer = self._get_fresh_buffer()
-
         with tqdm(
                 total=100,
                 desc="Converting audio_path to NumPy array",
                 bar_format="{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt} {unit}",
         ) as pbar:
-            audio_segment = AudioSegment.from_file(buffer, format="mp4")
-            wav_buffer = BytesIO()
-            audio_segment.export(wav_buffer, format="wav")
-            wav_buffer.seek(0)
+            if self.mmap_dir:
+                self.numpy_data, self.sample_rate = self._decode_to_npy()
+            else:
+                buffer = self._get_fresh_buffer()
+                audio_segment = AudioSegment.from_file(buffer, format="mp4")
+                wav_buffer = BytesIO()
+                audio_segment.export(wav_buffer, format="wav")
+                wav_buffer.seek(0)
+                del audio_segment  # Drop the decoded PCM copy before reading the WAV buffer
+                self.numpy_data, self.sample_rate = sf.read(wav_buffer, dtype=self.dtype)
             pbar.update(100)
 
-        self.numpy_data, self.sample_rate = sf.read(wav_buffer)
         return self.numpy_data, self.sample_rate
 
+    def _decode_to_npy(self):
+        """
+        Decode the audio_path block by block into a .npy file in mmap_dir, never holding the track in RAM.
+
+        Returns:
+            tuple: (np.memmap, int) - The samples, (frames,) for mono like sf.read, and the sample rate.
+        """
+        channels, sample_rate = self._probe_audio()
+        os.makedirs(self.mmap_dir, exist_ok=True)
+        mmap_path = os.path.join(self.mmap_dir, f"{self._sanitized_title()}.npy")
+        frame_bytes = channels * np.dtype(self.dtype).itemsize
+
+        frames = 0
+        with open(mmap_path, "wb") as f:
+            f.write(_npy_header(self.dtype, (0, channels)))  # Placeholder until the length is known
+            for block in self._decode_pcm(self.dtype, channels, sample_rate, block_frames=1 << 16):
+                f.write(block)
+                frames += len(block) // frame_bytes
+            f.seek(0)
+            f.write(_npy_header(self.dtype, (frames,) if channels == 1 else (frames, channels)))
+
+        return np.load(mmap_path, mmap_mode="r+"), sample_rate
+
+    def _probe_audio(self):
+        """Return the (channels, sample_rate) of the buffered audio_path stream."""
+        result = subprocess.run(
+            ["ffprobe", "-v", "fatal", "-select_streams", "a:0", "-show_entries", "stream=channels,sample_rate",
+             "-of", "json", "-read_ahead_limit", "-1", "cache:pipe:0"],
+            input=self._get_fresh_buffer().getvalue(),
+            capture_output=True,
+        )
+        if result.returncode != 0:
+            raise ValueError(f"{Fore.RED}ffprobe failed to read audio_path stream.{Style.RESET_ALL}")
+        stream = json.loads(result.stdout)["streams"][0]
+        return int(stream["channels"]), int(stream["sample_rate"])
+
     def _get_fresh_buffer(self):
         """Create a fresh copy of the audio_path buffer for each use."""
         if not self.audio_buffer:
@@ -95,6 +168,115 @@ class YouTubeAudioScraper:
         new_buffer.seek(0)
         return new_buffer
 
+    def stream_audio(self, block_frames=44100):
+        """
+        Decode the audio_path block by block while it is still downloading.
+
+        The download fills the buffer at full speed in a background thread while a second
+        thread feeds what has arrived so far to ffmpeg, so only decoded PCM waits on the
+        consumer and a slow consumer never stalls the connection. The downloaded buffer is
+        kept, so download_audio() afterwards does not download again.
+
+        Args:
+            block_frames (int, optional): Number of frames per yielded block.
+
+        Yields:
+            np.ndarray: float32 (frames, 2) blocks at 44.1kHz.
+        """
+        for block in self._decode_pcm("float32", 2, 44100, block_frames):
+            yield np.frombuffer(block, dtype=np.float32).reshape(-1, 2)  # Wraps the writable bytearray, no copy
+
+    def _decode_pcm(self, dtype, channels, sample_rate, block_frames):
+        """Decode the audio_path with ffmpeg, downloading it first if needed, yielding raw PCM bytearrays."""
+        process = subprocess.Popen(
+            # The cache: protocol lets ffmpeg seek in piped input, e.g. to a trailing moov atom
+            ["ffmpeg", "-loglevel", "fatal", "-read_ahead_limit", "-1", "-i", "cache:pipe:0",
+             "-f", PCM_FORMATS[dtype], "-ac", str(channels), "-ar", str(sample_rate), "pipe:1"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        errors = []
+        stop = threading.Event()
+        pending = deque()  # Downloaded chunks not yet fed to ffmpeg
+        arrived = threading.Condition()
+        downloader = None
+
+        def on_chunk(chunk):
+            if stop.is_set():
+                raise InterruptedError("Decoding was stopped")  # Abandon the download
+            with arrived:
+                pending.append(chunk)
+                arrived.notify()
+
+        def download():
+            try:
+                self._buffer_audio(on_chunk=on_chunk)
+            except Exception as e:
+                if not stop.is_set():
+                    errors.append(e)
+            finally:
+                with arrived:
+                    pending.append(None)  # End of download
+                    arrived.notify()
+
+        def feed():
+            try:
+                if downloader is None:
+                    process.stdin.write(self.audio_buffer.getvalue())
+                    return
+                while True:
+                    with arrived:
+                        while not pending:
+                            arrived.wait()
+                        chunk = pending.popleft()
+                    if chunk is None:
+                        return
+                    process.stdin.write(chunk)  # Blocks on ffmpeg only, never on the download
+            except BrokenPipeError:
+                pass  # ffmpeg exited early, its return code is checked below
+            finally:
+                process.stdin.close()
+
+        if not self.audio_buffer:
+            downloader = threading.Thread(target=download, daemon=True)
+            downloader.start()
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        try:
+            frame_bytes = channels * np.dtype(dtype).itemsize
+            while True:
+                block = bytearray(block_frames * frame_bytes)
+                n = process.stdout.readinto(block)
+                if not n:
+                    break
+                del block[n - n % frame_bytes:]  # Trim a short final block to whole frames
+                yield block
+            process.wait()
+        finally:
+            process.stdout.close()
+            if process.poll() is None:  # Consumer stopped early
+                stop.set()
+                process.kill()
+                process.wait()
+            feeder.join()
+            if downloader is not None:
+                downloader.join()
+
+        if errors:
+            raise errors[0]
+        if process.returncode != 0:
+            raise ValueError(f"{Fore.RED}ffmpeg failed to decode audio_path stream.{Style.RESET_ALL}")
+
+    def _sanitized_title(self):
+        """Make the video title safe to use as a file name."""
+        sanitized_title = re.sub(r"[\/| ]|[\s-]*-[\s-]*", "_", self.yt.title)
+        return re.sub(r"_+", "_", sanitized_title)
+
+    def get_output_path(self, destination_dir, format="wav"):
+        """Path download_audio() saves to for the given directory and format."""
+        return os.path.join(destination_dir, f"{self._sanitized_title()}.{format}")
+
     def download_audio(self, destination_dir, format="wav"):
         """
         Convert the YouTube audio_path to NumPy, then save as a WAV file.
@@ -104,7 +286,8 @@ class YouTubeAudioScraper:
             format (str, optional): The output format of the audio file (i.e. "wav" or "mp3").
 
         Returns:
-            tuple: (numpy_data, sample_rate, str) - NumPy data, sample rate, and the file path.
+            tuple: (numpy_data, sample_rate, str) - NumPy data, (frames, channels) or (frames,) for mono
+                (a np.memmap if mmap_dir was set), sample rate, and the file path.
         """
         # Ensure NumPy conversion happens before saving
         numpy_data, sample_rate = self._convert_to_numpy()
@@ -114,9 +297,7 @@ class YouTubeAudioScraper:
             os.makedirs(destination_dir)
             print(f"{Fore.GREEN}Created output directory: {destination_dir}{Style.RESET_ALL}")
 
-        sanitized_title = re.sub(r"[\/| ]|[\s-]*-[\s-]*", "_", self.yt.title)
-        sanitized_title = re.sub(r"_+", "_", sanitized_title)
-        output_path = os.path.join(destination_dir, f"{sanitized_title}.{format}")
+        output_path = self.get_output_path(destination_dir, format)
 
         with tqdm(
                 total=100,
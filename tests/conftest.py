@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Let plain `pytest` import the top-level packages (coordinator, enhancer, scraper) from any directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
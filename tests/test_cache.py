@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("librosa")
+
+from enhancer import EnhancementCache, enhance_stream
+
+SR = 44100
+MODEL_KEY = "checkpoint:10:torch.float32:44100"
+
+
+def _audio(frames=3 * SR + 17, channels=2, seed=0):
+    return np.random.default_rng(seed).uniform(-1, 1, (frames, channels)).astype(np.float32)
+
+
+def test_key_stable_across_strided_views():
+    audio = _audio()
+    contiguous = np.ascontiguousarray(audio.T)
+    strided = audio.T  # Same values, Fortran-ordered view
+    assert not strided.flags["C_CONTIGUOUS"]
+    assert EnhancementCache.key("track", MODEL_KEY, contiguous) == EnhancementCache.key("track", MODEL_KEY, strided)
+    assert EnhancementCache.key("track", MODEL_KEY, torch.from_numpy(strided)) == \
+        EnhancementCache.key("track", MODEL_KEY, contiguous)
+
+
+def test_key_changes_with_model_dtype_and_shape():
+    audio = np.ascontiguousarray(_audio().T)
+    base = EnhancementCache.key("track", MODEL_KEY, audio)
+    assert EnhancementCache.key("track", MODEL_KEY.replace("10", "5"), audio) != base
+    assert EnhancementCache.key("track", MODEL_KEY, audio.astype(np.float64)) != base
+    # Same bytes, different shape
+    assert EnhancementCache.key("track", MODEL_KEY, audio.reshape(1, -1)) != base
+    assert EnhancementCache.key("window", MODEL_KEY, audio) != base
+
+
+def test_eviction_removes_oldest_entries(tmp_path):
+    entry = np.zeros(1000, dtype=np.float32)
+    cache = EnhancementCache(str(tmp_path), max_bytes=10 ** 9)
+    keys = [f"track-{i}" for i in range(4)]
+    for age, key in zip((400, 300, 200, 100), keys):
+        cache.put(key, entry)
+        past = os.path.getmtime(cache._path(key)) - age
+        os.utime(cache._path(key), (past, past))
+    entry_bytes = os.path.getsize(cache._path(keys[0]))
+
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get(keys[0]) is not None
+    cache.max_bytes = 3 * entry_bytes
+    cache.put("track-new", entry)
+
+    remaining = sorted(name[:-len(".npy")] for name in os.listdir(tmp_path))
+    assert remaining == sorted([keys[0], keys[3], "track-new"])
+    assert cache.evictions == 2
+    assert cache.stats()["bytes"] == cache._bytes == 3 * entry_bytes
+
+
+def test_truncated_entry_is_a_miss(tmp_path):
+    cache = EnhancementCache(str(tmp_path))
+    cache.put("track-partial", np.ones((SR, 2), dtype=np.float32))
+    path = cache._path("track-partial")
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) // 2)
+
+    assert cache.get("track-partial") is None
+    assert cache.get("track-missing") is None
+    assert cache.counters["track"] == {"hits": 0, "misses": 2, "puts": 1}
+
+
+class _CountingModel:
+    """Deterministic stand-in for Apollo that can fail after a number of windows."""
+
+    def __init__(self, fail_after=None):
+        self.calls = 0
+        self.fail_after = fail_after
+
+    def __call__(self, chunk):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise RuntimeError("interrupted")
+        self.calls += 1
+        return (chunk * 0.5).unsqueeze(0)
+
+
+def _run(model, audio, cache):
+    blocks = torch.from_numpy(np.ascontiguousarray(audio.T)).split(SR, dim=-1)
+    with torch.no_grad():
+        return np.concatenate(list(enhance_stream(model, blocks, "cpu", SR, cache=cache, model_key=MODEL_KEY)))
+
+
+def test_per_window_resume_reuses_finished_windows(tmp_path):
+    audio = _audio(frames=32 * SR)
+    baseline = _CountingModel()
+    expected = _run(baseline, audio, None)
+
+    cache = EnhancementCache(str(tmp_path), per_window=True)
+    with pytest.raises(RuntimeError):
+        _run(_CountingModel(fail_after=3), audio, cache)
+    assert cache.counters["window"]["puts"] == 3
+
+    resumed = _CountingModel()
+    output = _run(resumed, audio, cache)
+    assert cache.counters["window"]["hits"] == 3
+    assert resumed.calls == baseline.calls - 3
+    np.testing.assert_array_equal(output, expected)
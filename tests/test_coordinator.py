@@ -0,0 +1,133 @@
+import json
+import multiprocessing
+import os
+import signal
+import time
+
+from coordinator import WorkQueue
+
+LEASE_TIMEOUT = 1.0
+NUM_JOBS = 12
+
+
+def _record_job(payload, queue):
+    # O_APPEND writes of one short line are atomic, so concurrent workers don't interleave
+    with open(payload["log"], "a") as f:
+        f.write(f"{payload['i']}\n")
+    time.sleep(0.05)
+    return {"i": payload["i"]}
+
+
+def _hold_lease(root):
+    queue = WorkQueue(root, lease_timeout=LEASE_TIMEOUT)
+    lease = queue.claim(["download"])
+    assert lease is not None
+    time.sleep(60)  # Keep heartbeating until killed
+
+
+def _run_worker(root):
+    WorkQueue(root, lease_timeout=LEASE_TIMEOUT).work({"download": _record_job}, poll_interval=0.1, max_idle=3)
+
+
+def _names(root, state):
+    return sorted(name for name in os.listdir(os.path.join(root, state)) if name.endswith(".json"))
+
+
+def test_killed_lease_holder_is_reclaimed_without_duplicates_or_losses(tmp_path):
+    root = str(tmp_path / "queue")
+    log = str(tmp_path / "log")
+    queue = WorkQueue(root, lease_timeout=LEASE_TIMEOUT)
+    job_ids = [queue.submit("download", {"i": i, "log": log}) for i in range(NUM_JOBS)]
+
+    holder = multiprocessing.Process(target=_hold_lease, args=(root,))
+    holder.start()
+    deadline = time.monotonic() + 10
+    while not _names(root, "leased"):
+        assert time.monotonic() < deadline, "holder never claimed a job"
+        time.sleep(0.05)
+    held_job = _names(root, "leased")[0].split("@")[0]
+
+    # Heartbeats must keep the lease alive past the timeout while the holder is running
+    time.sleep(LEASE_TIMEOUT * 2)
+    assert queue.reclaim_expired() == 0
+
+    os.kill(holder.pid, signal.SIGKILL)
+    holder.join()
+
+    workers = [multiprocessing.Process(target=_run_worker, args=(root,)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    assert _names(root, "pending") == []
+    assert _names(root, "leased") == []
+    assert _names(root, "failed") == []
+    assert _names(root, "done") == sorted(f"{job_id}.json" for job_id in job_ids)
+
+    with open(log) as f:
+        executed = sorted(int(line) for line in f)
+    assert executed == list(range(NUM_JOBS))
+
+    with open(os.path.join(root, "done", f"{held_job}.json")) as f:
+        assert json.load(f)["attempts"] == 2
+
+
+def test_stray_files_are_ignored(tmp_path):
+    root = str(tmp_path / "queue")
+    queue = WorkQueue(root, lease_timeout=LEASE_TIMEOUT)
+    for state, name in [("pending", "notes.json"), ("pending", "a-b.json"), ("leased", "stray.json")]:
+        with open(os.path.join(root, state, name), "w") as f:
+            f.write("{}")
+    job_id = queue.submit("download", {})
+
+    assert queue.reclaim_expired() == 0
+    lease = queue.claim(["download"])
+    assert lease.job["id"] == job_id
+    assert lease.complete()
+    assert queue.claim(["download"]) is None
+
+
+def test_complete_after_reclaim_does_not_duplicate_the_job(tmp_path):
+    root = str(tmp_path / "queue")
+    queue = WorkQueue(root, lease_timeout=LEASE_TIMEOUT)
+    job_id = queue.submit("download", {})
+    lease = queue.claim(["download"])
+    lease.follow_up("enhance", {})
+
+    # Another node reclaims the lease just before this one finishes
+    os.rename(lease.path, os.path.join(root, "pending", f"{job_id}.json"))
+
+    assert not lease.complete({"ok": True})
+    assert _names(root, "pending") == [f"{job_id}.json"]
+    assert _names(root, "leased") == []
+    assert _names(root, "done") == []
+
+
+def test_follow_ups_are_submitted_only_after_completion(tmp_path):
+    root = str(tmp_path / "queue")
+    queue = WorkQueue(root, lease_timeout=LEASE_TIMEOUT)
+    queue.submit("download", {})
+    lease = queue.claim(["download"])
+    lease.follow_up("enhance", {"input_path": "a.wav"})
+
+    assert queue.claim(["enhance"]) is None
+    assert lease.complete()
+    follow_up = queue.claim(["enhance"])
+    assert follow_up.payload == {"input_path": "a.wav"}
+    assert follow_up.complete()
+
+
+def test_released_job_keeps_its_history(tmp_path):
+    root = str(tmp_path / "queue")
+    queue = WorkQueue(root, lease_timeout=LEASE_TIMEOUT)
+    queue.submit("download", {})
+    lease = queue.claim(["download"])
+    lease.follow_up("enhance", {})
+    assert lease.release("network error")
+
+    retry = queue.claim(["download", "enhance"])
+    assert retry.kind == "download"
+    assert retry.job["attempts"] == 2
+    assert retry.job["history"][0]["error"] == "network error"
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("librosa")
+
+from enhancer import enhance_stream
+from enhancer.enhancer import _getWindowingArray
+
+SR = 44100
+BORDER = 5 * SR  # C - step for the 10-second chunk, N = 2
+
+
+def _ramp_model(chunk):
+    # Deterministic and position-dependent, so any misaligned window or weight shows up in the output
+    return (chunk * torch.linspace(0.5, 1.5, chunk.shape[-1])).unsqueeze(0)
+
+
+def _baseline_enchance(model, test_data, samplerate):
+    """The chunk loop as it was before enhance_stream, kept as the reference."""
+    C = 10 * samplerate
+    N = 2
+    step = C // N
+    fade_size = 3 * 44100
+    border = C - step
+
+    if len(test_data.shape) == 1:
+        test_data = test_data.unsqueeze(0)
+
+    if test_data.shape[1] > 2 * border and (border > 0):
+        test_data = torch.nn.functional.pad(test_data, (border, border), mode='reflect')
+
+    windowingArray = _getWindowingArray(C, fade_size)
+
+    result = torch.zeros((1,) + tuple(test_data.shape), dtype=torch.float32)
+    counter = torch.zeros((1,) + tuple(test_data.shape), dtype=torch.float32)
+
+    i = 0
+    while i < test_data.shape[1]:
+        part = test_data[:, i:i + C]
+        length = part.shape[-1]
+        if length < C:
+            if length > C // 2 + 1:
+                part = torch.nn.functional.pad(input=part, pad=(0, C - length), mode='reflect')
+            else:
+                part = torch.nn.functional.pad(input=part, pad=(0, C - length, 0, 0), mode='constant', value=0)
+
+        out = model(part.unsqueeze(0)).squeeze(0).squeeze(0)
+
+        window = windowingArray.clone()
+        if i == 0:
+            window[:fade_size] = 1
+        elif i + C >= test_data.shape[1]:
+            window[-fade_size:] = 1
+
+        result[..., i:i + length] += out[..., :length] * window[..., :length]
+        counter[..., i:i + length] += window[..., :length]
+        i += step
+
+    final_output = (result / counter).squeeze(0).numpy()
+    np.nan_to_num(final_output, copy=False, nan=0.0)
+    if test_data.shape[1] > 2 * border and (border > 0):
+        final_output = final_output[..., border:-border]
+    return final_output.T
+
+
+def _split(audio, sizes):
+    """Cut audio into consecutive blocks, cycling through sizes."""
+    blocks, start, k = [], 0, 0
+    while start < audio.shape[-1]:
+        blocks.append(audio[..., start:start + sizes[k % len(sizes)]])
+        start += sizes[k % len(sizes)]
+        k += 1
+    return blocks
+
+
+@pytest.mark.parametrize("channels", [1, 2])
+@pytest.mark.parametrize("frames", [
+    3 * SR,  # A single window
+    2 * BORDER,  # Longest unpadded input
+    2 * BORDER + 1,  # Shortest padded input
+    int(23.7 * SR),
+])
+@pytest.mark.parametrize("sizes", [
+    [10 ** 9],  # Whole input at once
+    [SR],
+    [1] * 50 + [3, 7, 60000, 1, 123457],  # Ragged, starting with 1-frame blocks
+])
+def test_enhance_stream_matches_baseline(channels, frames, sizes):
+    generator = torch.Generator().manual_seed(frames + channels)
+    audio = torch.rand((channels, frames) if channels == 2 else (frames,), generator=generator) * 2 - 1
+
+    expected = _baseline_enchance(_ramp_model, audio, SR)
+    with torch.no_grad():
+        actual = np.concatenate(list(enhance_stream(_ramp_model, _split(audio, sizes), "cpu", SR)), axis=0)
+
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-6)
+
+
+def test_enhance_stream_empty_input():
+    assert list(enhance_stream(_ramp_model, [], "cpu", SR)) == []
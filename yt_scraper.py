@@ -6,6 +6,42 @@ from colorama import Fore, Style
 from scraper import YouTubeAudioScraper
 
 
+def make_cache(cache_dir, cache_size_mb, cache_windows):
+    if not cache_dir:
+        return None
+    from enhancer.cache import EnhancementCache
+    return EnhancementCache(cache_dir, max_bytes=int(cache_size_mb * 2 ** 20), per_window=cache_windows)
+
+
+def enhance_audio(output_path, output_dir, weights, audio=None, cache=None):
+    import enhancer
+    print(f"{Fore.YELLOW}Model weights={weights}{Style.RESET_ALL}")
+    enhanced_filename = f"enhanced_{os.path.basename(output_path)}"
+    enhanced_path = os.path.join(output_dir, enhanced_filename)
+    # Hand the decoded (numpy_data, sample_rate) straight to the enhancer when we have it
+    enhancer.process_audio(audio if audio is not None else output_path, enhanced_path, weights, cache=cache)
+    return enhanced_path
+
+
+def download_job(payload, lease):
+    scraper = YouTubeAudioScraper(payload["url"], dtype=payload["dtype"], mmap_dir=payload["mmap_dir"])
+    _, _, output_path = scraper.download_audio(payload["output_dir"], payload["format"])
+    if payload["enhance"]:
+        # Hand enhancement to whichever node has the enhance role free, once this job is done
+        lease.follow_up("enhance", {"input_path": output_path, "output_dir": payload["output_dir"],
+                                 "weights": payload["weights"], "cache": payload["cache"]})
+    return {"output_path": output_path}
+
+
+def enhance_job(payload, lease):
+    enhanced_path = enhance_audio(payload["input_path"], payload["output_dir"], payload["weights"],
+                                  cache=make_cache(**payload["cache"]))
+    return {"output_path": enhanced_path}
+
+
+JOB_HANDLERS = {"download": download_job, "enhance": enhance_job}
+
+
 def main():
     parser = argparse.ArgumentParser(description="Download YouTube audio_path as WAV and convert to NumPy array.")
     parser.add_argument("--url", type=str, help="The YouTube video URL.")
@@ -13,23 +49,79 @@ def main():
     parser.add_argument("--format", type=str, choices=["wav", "mp3"], help="The output format of the audio file ('wav' or 'mp3')")
     parser.add_argument("--enhance", action="store_true", help="(Optional) Lossy audio restoration using Apollo.")
     parser.add_argument("--weights", type=str, nargs="?", default="(Optional) enhancer/weights/apollo_model_uni.ckpt")
+    parser.add_argument("--dtype", type=str, choices=["int16", "float32", "float64"], help="Sample type of the decoded NumPy array. Defaults to 'float32'. Not used with --pipeline.")
+    parser.add_argument("--mmap_dir", type=str, help="(Optional) Decode into a memory-mapped .npy file in this directory instead of RAM. Not used with --pipeline.")
+    parser.add_argument("--pipeline", action="store_true", help="(Optional) With --enhance, write the audio and its enhanced copy while it is still downloading and decoding. Streams float32 blocks, so no NumPy array is returned.")
+    parser.add_argument("--cache_dir", type=str, help="(Optional) Directory for caching enhanced outputs, keyed by input audio and model parameters.")
+    parser.add_argument("--cache_size_mb", type=float, default=10240, help="Size bound of --cache_dir before least recently used entries are evicted. Defaults to 10240.")
+    parser.add_argument("--cache_windows", action="store_true", help="(Optional) Also cache each 10-second window, so interrupted long tracks resume where they stopped. Costs about twice the float32 input size on disk (~2.5 GB per hour of stereo audio).")
+    parser.add_argument("--url_file", type=str, help="(Optional) Text file with one YouTube URL per line to submit to --queue_dir.")
+    parser.add_argument("--queue_dir", type=str, help="(Optional) Shared directory for multi-node work sharing. --url/--url_file jobs are submitted here instead of run directly; --output_dir must also be shared.")
+    parser.add_argument("--worker", action="store_true", help="(Optional) Run as a worker pulling jobs from --queue_dir.")
+    parser.add_argument("--roles", type=str, default="enhance,download", help="Comma-separated job kinds this worker takes, most preferred first. Defaults to 'enhance,download'.")
+    parser.add_argument("--lease_timeout", type=float, default=60.0, help="Seconds without a heartbeat before a job is reclaimed from a dead node. Defaults to 60.")
+    parser.add_argument("--max_idle", type=float, default=None, help="(Optional) Exit the worker after this many seconds with no work.")
 
     args = parser.parse_args()
 
+    if args.pipeline:
+        if not args.enhance:
+            parser.error("--pipeline requires --enhance")
+        if args.queue_dir:
+            parser.error("--pipeline cannot be combined with --queue_dir")
+        if args.dtype or args.mmap_dir:
+            parser.error("--dtype and --mmap_dir have no effect with --pipeline")
+    args.dtype = args.dtype or "float32"
+
     os.makedirs(args.output_dir, exist_ok=True)
 
     try:
+        if args.queue_dir:
+            from coordinator import WorkQueue
+            queue = WorkQueue(args.queue_dir, lease_timeout=args.lease_timeout)
+
+            urls = [args.url] if args.url else []
+            if args.url_file:
+                with open(args.url_file) as f:
+                    urls += [line.strip() for line in f if line.strip()]
+            for url in urls:
+                job_id = queue.submit("download", {"url": url, "output_dir": args.output_dir, "format": args.format,
+                                                   "dtype": args.dtype, "mmap_dir": args.mmap_dir,
+                                                   "enhance": args.enhance, "weights": args.weights,
+                                                   "cache": {"cache_dir": args.cache_dir, "cache_size_mb": args.cache_size_mb,
+                                                             "cache_windows": args.cache_windows}})
+                print(f"{Fore.GREEN}Submitted job {job_id} for URL: {url}{Style.RESET_ALL}")
+
+            if args.worker:
+                roles = [role.strip() for role in args.roles.split(",") if role.strip()]
+                unknown = [role for role in roles if role not in JOB_HANDLERS]
+                if unknown:
+                    raise ValueError(f"Unknown roles: {', '.join(unknown)}")
+                completed = queue.work({role: JOB_HANDLERS[role] for role in roles}, max_idle=args.max_idle)
+                print(f"{Fore.GREEN}Worker finished after completing {completed} jobs.{Style.RESET_ALL}")
+            return
+
+        if args.pipeline:
+            import enhancer
+            print(f"{Fore.YELLOW}Enhance={args.enhance} (pipelined){Style.RESET_ALL}")
+            print(f"{Fore.YELLOW}Model weights={args.weights}{Style.RESET_ALL}")
+            scraper = YouTubeAudioScraper(args.url, prefetch=False)
+            output_path = scraper.get_output_path(args.output_dir, args.format)
+            enhanced_path = os.path.join(args.output_dir, f"enhanced_{os.path.basename(output_path)}")
+            cache = make_cache(args.cache_dir, args.cache_size_mb, args.cache_windows)
+            # The plain file is written from the same decoded blocks, so nothing is decoded twice
+            enhancer.process_stream(scraper.stream_audio(), enhanced_path, args.weights, cache=cache,
+                                    input_wav=output_path)
+            return
+
         # Initialize the scraper and download audio_path
-        scraper = YouTubeAudioScraper(args.url)
+        scraper = YouTubeAudioScraper(args.url, dtype=args.dtype, mmap_dir=args.mmap_dir)
         numpy_data, sample_rate, output_path = scraper.download_audio(args.output_dir, args.format)
 
         if args.enhance:
-            import enhancer
             print(f"{Fore.YELLOW}Enhance={args.enhance}{Style.RESET_ALL}")
-            print(f"{Fore.YELLOW}Model weights={args.weights}{Style.RESET_ALL}")
-            enhanced_filename = f"enhanced_{os.path.basename(output_path)}"
-            enhanced_path = os.path.join(args.output_dir, enhanced_filename)
-            enhancer.process_audio(output_path, enhanced_path, args.weights)
+            cache = make_cache(args.cache_dir, args.cache_size_mb, args.cache_windows)
+            enhance_audio(output_path, args.output_dir, args.weights, audio=(numpy_data, sample_rate), cache=cache)
 
     except Exception as e:
         print(f"An error occurred: {str(e)}")